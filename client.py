@@ -1,27 +1,35 @@
 import socket
+import struct
 
-HEADER = 64
+HEADER = struct.Struct("!I")  # 4-byte big-endian message length, must match server.py
 PORT = 5050
 FORMAT = 'utf-8'
 DISCONNECT_MESSAGE = "!DISCONNECT"
 SERVER = "192.168.0.112"  # Use the same IP as in your server.py
 ADDR = (SERVER, PORT)
 
-# Set up and connect
-client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client.connect(ADDR)  # CONNECT TO SERVER
+def connect(addr=ADDR):
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(addr)  # CONNECT TO SERVER
+    return client
 
-def send(msg):
+def frame(msg):
     message = msg.encode(FORMAT)
-    msg_length = len(message)
-    send_length = str(msg_length).encode(FORMAT)
-    send_length += b' ' * (HEADER - len(send_length))  # Padding to HEADER size
-    client.send(send_length)
-    client.send(message)
-
-# Send a test message
-send("Hello, Server!")
-
-# Disconnect after sending
-send(DISCONNECT_MESSAGE)
-client.close()
+    return HEADER.pack(len(message)) + message
+
+def send(client, msg):
+    client.sendall(frame(msg))  # Header and message in a single write
+
+def send_batch(client, msgs):
+    # Coalesce many messages into one write
+    client.sendall(b"".join(frame(msg) for msg in msgs))
+
+if __name__ == "__main__":
+    client = connect()
+
+    # Send a test message
+    send(client, "Hello, Server!")
+
+    # Disconnect after sending
+    send(client, DISCONNECT_MESSAGE)
+    client.close()
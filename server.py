@@ -1,41 +1,140 @@
 import socket
-import threading
+import selectors
+import struct
 
-HEADER = 64
+HEADER = struct.Struct("!I")  # 4-byte big-endian message length
 PORT = 5050
 SERVER = socket.gethostbyname(socket.gethostname())  # Gets local IP address
 ADDR = (SERVER, PORT)
 FORMAT = 'utf-8'
 DISCONNECT_MESSAGE = "!DISCONNECT"
+BUFFER_SIZE = 64 * 1024  # initial receive buffer per client, grows for larger messages
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # 16 MB
+VERBOSE = False  # print every message (slow with many clients)
 
 #set up SERVER and bind ADDRESS
 server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 server.bind(ADDR)
 
-def handle_client(conn, addr):
+selector = selectors.DefaultSelector()
+clients = {}  # {conn: Client}
+accepting = False  # whether the listening socket is registered with the selector
+
+class Client:
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.buffer = bytearray(BUFFER_SIZE)
+        self.start = 0  # first unparsed byte
+        self.end = 0  # end of received data
+        self.needed = 0  # size of the message currently being received, header included
+        self.message_count = 0
+
+    def fill(self):
+        # Make room at the end of the buffer before reading into it
+        if self.end == len(self.buffer):
+            if self.start > 0:
+                pending = self.end - self.start
+                self.buffer[:pending] = self.buffer[self.start:self.end]
+                self.start, self.end = 0, pending
+            else:
+                # Buffer is full of one partial message: grow as its payload arrives, never past its size
+                self.buffer.extend(bytes(min(len(self.buffer), self.needed - len(self.buffer))))
+
+        with memoryview(self.buffer) as view:
+            received = self.conn.recv_into(view[self.end:])
+        self.end += received
+        return received
+
+    def messages(self):
+        # Yield every complete message in the buffer, short reads stay buffered for the next fill
+        while self.end - self.start >= HEADER.size:
+            (msg_length,) = HEADER.unpack_from(self.buffer, self.start)
+            if msg_length > MAX_MESSAGE_SIZE:
+                raise ValueError(f"message of {msg_length} bytes exceeds limit")
+            msg_end = self.start + HEADER.size + msg_length
+            if msg_end > self.end:
+                self.needed = msg_end - self.start
+                break
+            msg = self.buffer[self.start + HEADER.size:msg_end].decode(FORMAT)
+            self.start = msg_end
+            yield msg
+
+        if self.start == self.end:
+            self.start = self.end = 0
+            if len(self.buffer) > BUFFER_SIZE:
+                # Release the memory a large message needed
+                self.buffer = bytearray(BUFFER_SIZE)
+
+def handle_message(client, msg):
+    client.message_count += 1
+    if VERBOSE:
+        print(f"[{client.addr}] {msg}")
+
+def accept_client(sock):
+    try:
+        conn, addr = sock.accept()
+    except (BlockingIOError, InterruptedError):
+        return  # Spurious wakeup, nothing to accept
+    except OSError as e:
+        # e.g. EMFILE when out of file descriptors: keep serving connected clients and
+        # stop accepting until one disconnects, otherwise the pending connection spins the loop
+        print(f"[ERROR] accept failed: {e}")
+        pause_accepting()
+        return
+    conn.setblocking(False)
+    clients[conn] = Client(conn, addr)
+    selector.register(conn, selectors.EVENT_READ, read_client)
     print(f"[NEW CONNECTION] {addr} connected.")
-    connected = True
-    while connected:
-        msg_length = conn.recv(HEADER).decode(FORMAT)
-        if msg_length:
-            msg_length = int(msg_length)
-            msg = conn.recv(msg_length).decode(FORMAT) 
+    print(f"[ACTIVE CONNECTIONS] {len(clients)}")
+
+def pause_accepting():
+    global accepting
+    if accepting:
+        selector.unregister(server)
+        accepting = False
+
+def resume_accepting():
+    global accepting
+    if not accepting:
+        selector.register(server, selectors.EVENT_READ, accept_client)
+        accepting = True
+
+def read_client(conn):
+    client = clients[conn]
+    try:
+        if not client.fill():
+            disconnect_client(client)  # Handle abrupt disconnection
+            return
+        for msg in client.messages():
             if msg == DISCONNECT_MESSAGE:
-                connected = False
-            print(f"[{addr}] {msg}")
-        else:
-            break  # Handle abrupt disconnection
-    conn.close()
-    print(f"[DISCONNECTED] {addr} disconnected.")
+                disconnect_client(client)
+                return
+            handle_message(client, msg)
+    except BlockingIOError:
+        return  # Spurious wakeup, wait for the next read event
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        print(f"[ERROR] {client.addr}: {e}")
+        disconnect_client(client)
+
+def disconnect_client(client):
+    selector.unregister(client.conn)
+    del clients[client.conn]
+    client.conn.close()
+    resume_accepting()
+    print(f"[DISCONNECTED] {client.addr} disconnected after {client.message_count} messages.")
 
 def start():
-    server.listen()
+    server.listen(1024)
+    server.setblocking(False)
+    resume_accepting()
     print(f"[LISTENING] Server is listening on {SERVER}")
     while True:
-        conn, addr = server.accept()  # Blocking line of code
-        thread = threading.Thread(target=handle_client, args=(conn, addr))
-        thread.start()
-        print(f"[ACTIVE CONNECTIONS] {threading.activeCount() - 1}")
+        for key, _ in selector.select():  # Blocking line of code
+            callback = key.data
+            callback(key.fileobj)
 
-print("[STARTING] Server is starting...")
-start()
+if __name__ == "__main__":
+    print("[STARTING] Server is starting...")
+    start()
@@ -0,0 +1,28 @@
+import struct
+
+# Messages are framed as a 4-byte big-endian length followed by the UTF-8 payload
+FRAME_HEADER = struct.Struct("!I")
+MAX_MESSAGE_SIZE = 1024 * 1024  # 1 MB
+
+def frame_message(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def recv_exact(conn, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = conn.recv_into(view[received:], size - received)
+        if not count:
+            return None  # Connection closed
+        received += count
+    return bytes(buffer)
+
+def recv_frame(conn):
+    header = recv_exact(conn, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {length} bytes exceeds limit of {MAX_MESSAGE_SIZE}")
+    return recv_exact(conn, length)
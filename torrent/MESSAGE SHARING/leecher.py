@@ -1,6 +1,8 @@
 import socket
 import logging
 import time
+import threading
+from framing import frame_message, recv_frame
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -15,6 +17,11 @@ RETRY_DELAY = 2  # seconds
 class MessageLeecher:
     def __init__(self):
         self.leecher_udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        # Persistent connection to the seeder relaying our messages
+        self.tcp_client = None
+        self.seeder_addr = None
+        self.send_lock = threading.Lock()
         
     def get_seeders(self):
         try:
@@ -39,49 +46,92 @@ class MessageLeecher:
             logging.error(f"Error getting seeders: {e}")
             return []
 
-    def send_message(self, seeder_addr, message):
-        tcp_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        
-        try:
-            ip, port = seeder_addr.split(":")
+    def connect(self, seeders):
+        # Open one long-lived connection to the first seeder that accepts it
+        for seeder_addr in seeders:
+            logging.info(f"Attempting to connect to seeder: {seeder_addr}")
+            ip, port = seeder_addr.split(":")[:2]
             seeder_socket_addr = (ip, int(port))
-            
-            # Connect to seeder
-            tcp_client.connect(seeder_socket_addr)
-            logging.info(f"Connected to seeder {seeder_socket_addr}")
-            
-            # Send message
-            tcp_client.send(message.encode(FORMAT))
-            
-            # Receive response
-            response = tcp_client.recv(1024).decode(FORMAT)
-            logging.info(f"Seeder response: {response}")
-            
-            return True
-        
+
+            for attempt in range(MAX_RETRIES):
+                tcp_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                try:
+                    tcp_client.connect(seeder_socket_addr)
+                    tcp_client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    logging.info(f"Connected to seeder {seeder_socket_addr}")
+
+                    self.tcp_client = tcp_client
+                    self.seeder_addr = seeder_addr
+                    threading.Thread(target=self.receive_messages, daemon=True).start()
+                    return True
+                except Exception as e:
+                    tcp_client.close()
+                    logging.warning(f"Connection attempt {attempt + 1} to {seeder_addr} failed: {e}")
+                    if attempt < MAX_RETRIES - 1:
+                        time.sleep(RETRY_DELAY)
+
+        return False
+
+    def receive_messages(self):
+        tcp_client = self.tcp_client
+        try:
+            while True:
+                payload = recv_frame(tcp_client)
+                if payload is None:
+                    logging.info(f"Seeder {self.seeder_addr} closed the connection")
+                    break
+                print(f"\n[MESSAGE] {payload.decode(FORMAT, errors='replace')}")
         except Exception as e:
-            logging.error(f"Error sending message to {seeder_addr}: {e}")
-            return False
+            logging.error(f"Error receiving messages from {self.seeder_addr}: {e}")
         finally:
+            self.disconnect(tcp_client)
+
+    def disconnect(self, tcp_client=None):
+        with self.send_lock:
+            if tcp_client is None or tcp_client is self.tcp_client:
+                tcp_client = self.tcp_client
+                self.tcp_client = None
+        if tcp_client is not None:
             tcp_client.close()
 
+    def send_messages(self, messages):
+        # Coalesce all messages into a single write on the persistent connection
+        data = b"".join(frame_message(message.encode(FORMAT)) for message in messages)
+
+        with self.send_lock:
+            if self.tcp_client is None:
+                logging.error("Not connected to a seeder.")
+                return False
+            try:
+                self.tcp_client.sendall(data)
+                return True
+            except Exception as e:
+                logging.error(f"Error sending messages to {self.seeder_addr}: {e}")
+                return False
+
+    def send_message(self, message):
+        return self.send_messages([message])
+
     def communicate(self):
-        # Get list of seeders
-        seeders = self.get_seeders()
-        
-        if not seeders:
-            logging.error("No seeders found.")
-            return False
-        
-        # Try sending message to first seeder
+        # Reconnect only if we have no live connection
+        if self.tcp_client is None:
+            seeders = self.get_seeders()
+
+            if not seeders:
+                logging.error("No seeders found.")
+                return False
+
+            if not self.connect(seeders):
+                logging.error("Failed to connect to any seeder.")
+                return False
+
         message = input("Enter message to send: ")
-        
-        for seeder in seeders:
-            logging.info(f"Attempting to send message to seeder: {seeder}")
-            if self.send_message(seeder, message):
-                return True
-        
-        logging.error("Failed to send message to any seeder.")
+
+        if self.send_message(message):
+            return True
+
+        # The connection broke, drop it so the next message reconnects
+        self.disconnect()
         return False
 
 def main():
@@ -96,5 +146,7 @@ def main():
         if cont != 'y':
             break
 
+    leecher.disconnect()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,7 @@ import socket
 import threading
 import logging
 import time
+from framing import frame_message, recv_frame
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -12,9 +13,94 @@ LOCAL_IP = socket.gethostbyname(socket.gethostname())
 TRACKER_IP = LOCAL_IP
 TRACKER_ADDR = (TRACKER_IP, 6020)
 SEEDER_PORT = 7000
+ANNOUNCE_INTERVAL = 60  # seconds between re-registrations, keeps us within the tracker's TTL
 FORMAT = 'utf-8'
 CHUNK_SIZE = 512  # keeping for compatibility
 
+MAX_BATCH_SIZE = 64 * 1024  # bytes coalesced into a single write
+MAX_OUTBOX_SIZE = 4 * 1024 * 1024  # bytes queued for one peer, relaying waits while it is full
+SLOW_PEER_TIMEOUT = 2  # seconds full outboxes may go undrained before those peers are dropped
+
+class PeerConnection:
+    # A long-lived peer socket with a writer thread that batches queued frames into few writes
+
+    def __init__(self, conn, addr):
+        self.conn = conn
+        self.addr = addr
+        self.outbox = []
+        self.outbox_size = 0
+        self.outbox_ready = threading.Condition()
+        self.closed = False
+
+        self.writer_thread = threading.Thread(target=self.flush_outbox, daemon=True)
+        self.writer_thread.start()
+
+    def try_send(self, frame):
+        # Queue the frame if there is room, returns False only when the outbox is full
+        with self.outbox_ready:
+            if self.closed:
+                return True
+            if self.outbox_size + len(frame) > MAX_OUTBOX_SIZE:
+                return False
+            self.outbox.append(frame)
+            self.outbox_size += len(frame)
+            self.outbox_ready.notify_all()
+            return True
+
+    def send(self, frame, deadline):
+        # Wait until the deadline for room rather than buffering without bound, this pushes back on the sender over TCP
+        with self.outbox_ready:
+            self.outbox_ready.wait_for(
+                lambda: self.closed or self.outbox_size + len(frame) <= MAX_OUTBOX_SIZE,
+                timeout=max(0, deadline - time.monotonic())
+            )
+            # The condition's lock is reentrant, so the frame is queued without letting another sender in
+            if self.try_send(frame):
+                return
+
+        logging.warning(f"Peer {self.addr} is not reading, disconnecting it")
+        self.close()
+
+    def flush_outbox(self):
+        try:
+            while True:
+                with self.outbox_ready:
+                    while not self.outbox and not self.closed:
+                        self.outbox_ready.wait()
+                    if self.closed:
+                        return
+                    batch, self.outbox = self.outbox, []
+                    self.outbox_size = 0
+                    self.outbox_ready.notify_all()
+
+                # Coalesce everything queued since the last write
+                pending = []
+                pending_size = 0
+                for frame in batch:
+                    pending.append(frame)
+                    pending_size += len(frame)
+                    if pending_size >= MAX_BATCH_SIZE:
+                        self.conn.sendall(b"".join(pending))
+                        pending = []
+                        pending_size = 0
+                if pending:
+                    self.conn.sendall(b"".join(pending))
+        except OSError as e:
+            logging.info(f"Write to {self.addr} failed: {e}")
+            self.close()
+
+    def close(self):
+        with self.outbox_ready:
+            if self.closed:
+                return
+            self.closed = True
+            self.outbox_ready.notify_all()
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
 class SeederServer:
     def __init__(self):
         # UDP Socket for tracker communication
@@ -25,7 +111,11 @@ class SeederServer:
         self.seeder_tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         
         self.seeder_tcp.bind((LOCAL_IP, SEEDER_PORT))
-        self.seeder_tcp.listen(5)
+        self.seeder_tcp.listen(128)
+
+        # Connected peers, every one of them receives each relayed message
+        self.peers = set()
+        self.peers_lock = threading.Lock()
 
     def register_with_tracker(self):
         try:
@@ -35,41 +125,72 @@ class SeederServer:
         except Exception as e:
             logging.error(f"Failed to register with tracker: {e}")
 
+    def broadcast(self, frame, sender):
+        with self.peers_lock:
+            peers = [peer for peer in self.peers if peer is not sender]
+        # Deliver to every peer with room first, so healthy subscribers never wait behind a slow one
+        full_peers = [peer for peer in peers if not peer.try_send(frame)]
+
+        # Then give the full ones one shared grace period to drain, and drop those that don't
+        deadline = time.monotonic() + SLOW_PEER_TIMEOUT
+        for peer in full_peers:
+            peer.send(frame, deadline)
+
     def handle_client_connection(self, conn, addr):
+        peer = PeerConnection(conn, addr)
+        with self.peers_lock:
+            self.peers.add(peer)
+            peer_count = len(self.peers)
+        logging.info(f"Peer {addr} subscribed ({peer_count} connected)")
+
         try:
-            # Receive message
-            message = conn.recv(1024).decode(FORMAT)
-            logging.info(f"Received message from {addr}: {message}")
-            
-            # Optional: Echo back or process message
-            response = f"Seeder received: {message}"
-            conn.send(response.encode(FORMAT))
-        
+            # Keep relaying messages until the peer disconnects
+            while True:
+                payload = recv_frame(conn)
+                if payload is None:
+                    break
+                logging.debug(f"Received message from {addr}: {payload.decode(FORMAT, errors='replace')}")
+
+                # Frame once and reuse the same bytes for every subscriber
+                self.broadcast(frame_message(payload), peer)
+
         except Exception as e:
             logging.error(f"Error handling connection from {addr}: {e}")
         finally:
-            conn.close()
+            with self.peers_lock:
+                self.peers.discard(peer)
+            peer.close()
+            logging.info(f"Peer {addr} disconnected")
 
     def listen_for_messages(self):
         logging.info(f"Seeder listening on {LOCAL_IP}:{SEEDER_PORT}")
         while True:
             try:
                 conn, addr = self.seeder_tcp.accept()
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 logging.info(f"New connection from {addr}")
                 
-                # Handle in a separate thread
+                # Each long-lived connection gets its own reader thread
                 client_thread = threading.Thread(
                     target=self.handle_client_connection, 
-                    args=(conn, addr)
+                    args=(conn, addr),
+                    daemon=True
                 )
                 client_thread.start()
                 
             except Exception as e:
                 logging.error(f"Error accepting connection: {e}")
 
+    def announce_periodically(self):
+        # Re-register so the tracker keeps us listed and relearns us after a restart
+        while True:
+            time.sleep(ANNOUNCE_INTERVAL)
+            self.register_with_tracker()
+
     def start(self):
         # Register with tracker
         self.register_with_tracker()
+        threading.Thread(target=self.announce_periodically, daemon=True).start()
 
         # Start listening thread
         listening_thread = threading.Thread(
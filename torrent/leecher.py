@@ -3,6 +3,12 @@ import logging
 import time
 import traceback
 import os
+import queue
+import threading
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG,
@@ -18,6 +24,21 @@ FORMAT = 'utf-8'
 CHUNK_SIZE = 512 * 1024  # 512 KB
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
+RECV_SIZE = 64 * 1024  # bytes per recv_into call
+MAX_READERS = 4  # socket reader threads, one per seeder
+PIPELINE_DEPTH = 8  # shared memory buffers in flight, bounds memory use and provides backpressure
+CHECK_WORKERS = min(os.cpu_count() or 1, PIPELINE_DEPTH)  # processes checking chunks, more could never be busy
+
+def check_chunk(block_name, length, is_last_chunk):
+    # Runs in a worker process: attach to the chunk's shared memory block instead of receiving a copy.
+    # Only the length can be checked, the protocol carries no hashes, so the SHA-1 is just for the log.
+    if length == 0 or length > CHUNK_SIZE or (length < CHUNK_SIZE and not is_last_chunk):
+        raise ValueError(f"got {length} bytes, expected {'at most ' if is_last_chunk else ''}{CHUNK_SIZE}")
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        return hashlib.sha1(block.buf[:length]).hexdigest()
+    finally:
+        block.close()
 
 class FileLeecher:
     def __init__(self, filename):
@@ -70,8 +91,57 @@ class FileLeecher:
             logging.error(traceback.format_exc())
             return []
 
-    def download_chunks(self, seeder_info, num_chunks_to_request=2):
+    def get_chunk_count(self, seeder_info):
         tcp_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            tcp_client.settimeout(30)
+            tcp_client.connect((seeder_info['ip'], int(seeder_info['port'])))
+            tcp_client.sendall(f"GET_CHUNK_COUNT {self.filename}".encode(FORMAT))
+            total_chunks = int(tcp_client.recv(1024).decode(FORMAT))
+            tcp_client.sendall(f"DONE {self.filename}".encode(FORMAT))
+            return total_chunks
+        except Exception as e:
+            logging.error(f"Error getting chunk count from {seeder_info['addr']}: {e}")
+            return 0
+        finally:
+            try:
+                tcp_client.close()
+            except:
+                pass
+
+    def receive_chunk(self, tcp_client, chunk_id, buffer):
+        # Receive straight into the shared memory block, no intermediate copies
+        view = memoryview(buffer)[:CHUNK_SIZE]
+        bytes_received = 0
+        try:
+            while bytes_received < CHUNK_SIZE:
+                try:
+                    received = tcp_client.recv_into(view[bytes_received:], min(RECV_SIZE, CHUNK_SIZE - bytes_received))
+                    if not received:
+                        # Connection closed by seeder
+                        logging.warning(f"Connection closed by seeder while downloading chunk {chunk_id}")
+                        break
+
+                    bytes_received += received
+
+                    file_size = os.path.getsize(self.filename) if os.path.exists(self.filename) else CHUNK_SIZE
+                    if bytes_received < CHUNK_SIZE and file_size < CHUNK_SIZE:
+                        # We've probably received the entire file if it's smaller than CHUNK_SIZE
+                        break
+                except socket.timeout:
+                    logging.warning(f"Timeout while receiving data for chunk {chunk_id}")
+                    break
+                except ConnectionResetError:
+                    logging.warning(f"Connection reset by seeder while downloading chunk {chunk_id}")
+                    break
+        finally:
+            view.release()
+        return bytes_received
+
+    def download_chunks(self, seeder_info, total_chunks, chunk_ids, free_blocks, write_queue, pool):
+        # Reader stage: pull chunk ids, receive them into shared memory and hand them to the checking pool
+        tcp_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        received_chunks = 0
 
         try:
             ip, port = seeder_info['ip'], int(seeder_info['port'])
@@ -92,98 +162,158 @@ class FileLeecher:
                     else:
                         raise
 
-            # Get total chunks
-            tcp_client.sendall(f"GET_CHUNK_COUNT {self.filename}".encode(FORMAT))
-            total_chunks_data = tcp_client.recv(1024)
-            total_chunks = int(total_chunks_data.decode(FORMAT))
-            logging.info(f"Total chunks: {total_chunks}")
-
-            # Adjust num_chunks_to_request based on total available
-            num_chunks_to_request = min(num_chunks_to_request, total_chunks)
-            
-            # Request chunks
-            chunks = []
-            print(f"{num_chunks_to_request} chunks from seeder at {seeder_info['addr']} being requested")
-
-            for chunk_id in range(num_chunks_to_request):
+            while True:
+                try:
+                    chunk_id = chunk_ids.get_nowait()
+                except queue.Empty:
+                    break
+
+                # Blocks while every buffer is in flight, which throttles the socket reads
+                block = free_blocks.get()
                 try:
                     tcp_client.sendall(f"GET_CHUNK {self.filename} {chunk_id}".encode(FORMAT))
-                    chunk_buffer = bytearray()
+                    bytes_received = self.receive_chunk(tcp_client, chunk_id, block.buf)
+                except Exception as chunk_err:
+                    logging.warning(f"Error downloading chunk {chunk_id}: {chunk_err}")
                     bytes_received = 0
 
-                    while bytes_received < CHUNK_SIZE:
-                        try:
-                            part = tcp_client.recv(min(8192, CHUNK_SIZE - bytes_received))
-                            if not part:
-                                # Connection closed by seeder
-                                logging.warning(f"Connection closed by seeder while downloading chunk {chunk_id}")
-                                break
-                            
-                            chunk_buffer.extend(part)
-                            bytes_received += len(part)
-
-                            file_size = os.path.getsize(self.filename) if os.path.exists(self.filename) else CHUNK_SIZE
-                            if bytes_received < CHUNK_SIZE and file_size < CHUNK_SIZE:
-                                # We've probably received the entire file if it's smaller than CHUNK_SIZE
-                                break
-                        except socket.timeout:
-                            logging.warning(f"Timeout while receiving data for chunk {chunk_id}")
-                            break
-                        except ConnectionResetError:
-                            logging.warning(f"Connection reset by seeder while downloading chunk {chunk_id}")
-                            break
-
-                    if bytes_received > 0:
-                        chunks.append(bytes(chunk_buffer))
-                        logging.debug(f"Successfully downloaded chunk {chunk_id} ({bytes_received} bytes)")
-                    else:
+                # Only the last chunk of the file may be shorter than CHUNK_SIZE
+                is_last_chunk = chunk_id == total_chunks - 1
+                if bytes_received == 0 or (bytes_received < CHUNK_SIZE and not is_last_chunk):
+                    if bytes_received == 0:
                         logging.warning(f"No data received for chunk {chunk_id}, seeder may have limited chunk sharing")
-                        # Don't raise an error, just stop trying to get more chunks
-                        break
-                    
-                except Exception as chunk_err:
-                    logging.warning(f"Error downloading chunk {chunk_id}: {chunk_err}")
-                    # Continue to next chunk rather than failing completely
+                    else:
+                        logging.warning(f"Chunk {chunk_id} cut short at {bytes_received} bytes, dropping connection")
+                    # Give the chunk back so another seeder can serve it
+                    free_blocks.put(block)
+                    chunk_ids.put(chunk_id)
                     break
 
-            print(f"{len(chunks)} chunks have been successfully received from seeder at {seeder_info['addr']}")
-            return chunks
+                future = pool.submit(check_chunk, block.name, bytes_received, is_last_chunk)
+                write_queue.put((chunk_id, block, bytes_received, future))
+                received_chunks += 1
+                logging.debug(f"Received chunk {chunk_id} ({bytes_received} bytes) from {seeder_info['addr']}")
 
         except Exception as e:
             logging.error(f"Download error from {seeder_info['addr']}: {e}")
             logging.error(traceback.format_exc())
-            return []
         finally:
             try:
                 tcp_client.close()
             except:
                 pass
 
-    def download_file(self):
+        print(f"{received_chunks} chunks have been successfully received from seeder at {seeder_info['addr']}")
+        return received_chunks
+
+    def write_chunks(self, f, write_queue, free_blocks, results):
+        # Writer stage: write chunks that passed their check at their offset in the output file
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+
+            chunk_id, block, length, future = item
+            try:
+                try:
+                    digest = future.result()
+                except ValueError as e:
+                    # Leave it out of results so it is reported as missing
+                    logging.warning(f"Chunk {chunk_id} failed its length check: {e}")
+                    continue
+                f.seek(chunk_id * CHUNK_SIZE)
+                f.write(block.buf[:length])
+                results['written'].add(chunk_id)
+                logging.debug(f"Wrote chunk {chunk_id} ({length} bytes, sha1 {digest})")
+            except Exception as e:
+                logging.error(f"Error writing chunk {chunk_id}: {e}")
+                logging.error(traceback.format_exc())
+            finally:
+                free_blocks.put(block)
+
+    def download_file(self, num_chunks_to_request=2):
         seeders = self.get_seeders()
         if not seeders:
             logging.error("No seeders found.")
             return False
 
-        seeder = seeders[0]  # Use only the first seeder
-        logging.info(f"Attempting to download chunks from seeder: {seeder['addr']} (has {seeder['chunks']} chunks)")
-        chunks = self.download_chunks(seeder)
+        total_chunks = max(seeder['chunks'] for seeder in seeders) or self.get_chunk_count(seeders[0])
+        num_chunks_to_request = min(num_chunks_to_request, total_chunks)
+        if num_chunks_to_request == 0:
+            logging.error("Failed to determine the number of chunks to download.")
+            return False
+        logging.info(f"Total chunks: {total_chunks}, requesting {num_chunks_to_request} from {len(seeders)} seeder(s)")
+
+        chunk_ids = queue.Queue()
+        for chunk_id in range(num_chunks_to_request):
+            chunk_ids.put(chunk_id)
 
-        if chunks:
+        try:
+            # Open the output before starting any stage, so a failure here can't leave readers waiting on the writer
+            f = open(f"partial_{self.filename}", "wb")
+        except Exception as e:
+            logging.error(f"Error saving file: {e}")
+            logging.error(traceback.format_exc())
+            return False
+
+        with f:
+            blocks = []
             try:
-                with open(f"partial_{self.filename}", "wb") as f:
-                    for chunk in chunks:
-                        f.write(chunk)
-                logging.info(f"Downloaded {len(chunks)} chunks of {self.filename} successfully.")
-                return True
-            except Exception as e:
-                logging.error(f"Error saving file: {e}")
-                logging.error(traceback.format_exc())
-                return False
-        else:
+                # Fixed pool of shared memory buffers, so chunk data never gets pickled to the checking workers
+                try:
+                    for _ in range(PIPELINE_DEPTH):
+                        blocks.append(shared_memory.SharedMemory(create=True, size=CHUNK_SIZE))
+                except OSError as e:
+                    logging.error(f"Error allocating chunk buffers: {e}")
+                    return False
+                free_blocks = queue.Queue()
+                for block in blocks:
+                    free_blocks.put(block)
+                write_queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+                results = {'written': set()}
+
+                # Spawn rather than fork, forked workers would inherit the open seeder connections
+                with ProcessPoolExecutor(max_workers=CHECK_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    writer_thread = threading.Thread(target=self.write_chunks, args=(f, write_queue, free_blocks, results))
+                    writer_thread.start()
+
+                    reader_threads = []
+                    for seeder in seeders[:MAX_READERS]:
+                        logging.info(f"Attempting to download chunks from seeder: {seeder['addr']} (has {seeder['chunks']} chunks)")
+                        reader_thread = threading.Thread(
+                            target=self.download_chunks,
+                            args=(seeder, total_chunks, chunk_ids, free_blocks, write_queue, pool)
+                        )
+                        reader_thread.start()
+                        reader_threads.append(reader_thread)
+
+                    for reader_thread in reader_threads:
+                        reader_thread.join()
+                    write_queue.put(None)
+                    writer_thread.join()
+            finally:
+                # Only the blocks that were actually created
+                for block in blocks:
+                    block.close()
+                    block.unlink()
+
+        written = results['written']
+        if not written:
             logging.error("Failed to download any chunks from seeder.")
             return False
 
+        # A chunk handed back by a failing reader is lost if the other readers had already finished
+        missing = sorted(set(range(num_chunks_to_request)) - written)
+        holes = [chunk_id for chunk_id in missing if chunk_id < max(written)]
+        if holes:
+            logging.error(f"Chunks {holes} of {self.filename} were not downloaded, partial file has gaps.")
+            return False
+        if missing:
+            logging.warning(f"Chunks {missing} of {self.filename} were not downloaded.")
+
+        logging.info(f"Downloaded {len(written)} chunks of {self.filename} successfully.")
+        return True
+
 def main():
     filename = "large_text_file.txt"
     leecher = FileLeecher(filename)
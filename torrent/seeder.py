@@ -18,6 +18,7 @@ LOCAL_IP = socket.gethostbyname(socket.gethostname())
 TRACKER_IP = LOCAL_IP
 TRACKER_ADDR = (TRACKER_IP, 6020)
 SEEDER_PORT = 7000
+ANNOUNCE_INTERVAL = 60  # seconds between re-registrations, keeps us within the tracker's TTL
 FORMAT = 'utf-8'
 CHUNK_SIZE = 512 * 1024  # 512 KB in bytes
 
@@ -144,9 +145,16 @@ class SeederServer:
                 logging.error(traceback.format_exc())
                 time.sleep(1)  # Prevent tight error loop
 
+    def announce_periodically(self):
+        # Re-register so the tracker keeps us listed and relearns us after a restart
+        while True:
+            time.sleep(ANNOUNCE_INTERVAL)
+            self.register_with_tracker()
+
     def start(self):
         # Register with tracker
         self.register_with_tracker()
+        threading.Thread(target=self.announce_periodically, daemon=True).start()
 
         # Start listening thread
         listening_thread = threading.Thread(
@@ -1,6 +1,8 @@
 import socket
 import threading
 import os
+import json
+import time
 
 HEADER = 64
 PORT = 6020
@@ -9,11 +11,133 @@ ADDR = (SERVER, PORT)
 FORMAT = 'utf-8'
 CHUNK_SIZE = 512 * 1024  # 512 KB (you can adjust this value)
 
+# Registry persistence: periodic snapshot plus a journal of announces since the last one
+SNAPSHOT_FILE = "tracker_snapshot.json"
+JOURNAL_FILES = ("tracker_journal.0.log", "tracker_journal.1.log")  # alternated at each snapshot
+SNAPSHOT_INTERVAL = 30  # seconds
+SEEDER_TTL = 180  # seconds without an announce before a seeder is dropped
+
 # Set up the UDP socket
 tracker = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 tracker.bind(ADDR)
 
 active_seeders = {}  # {filename: [(ip, port, chunk_count), ...]}
+last_seen = {}  # {(filename, ip, port): time of last announce}
+registry_lock = threading.Lock()
+journal = None
+journal_index = 0  # which of JOURNAL_FILES is being appended to
+
+def upsert_seeder(filename, ip, port, chunks, seen_at):
+    # Add or update seeder info, called with registry_lock held
+    key = (filename, ip, port)
+    if seen_at < last_seen.get(key, 0):
+        return  # Older than what we have, so snapshot and journals can be replayed in any order
+    last_seen[key] = seen_at
+    seeders = active_seeders.setdefault(filename, [])
+    for i, seeder in enumerate(seeders):
+        if (seeder[0], seeder[1]) == (ip, port):
+            seeders[i] = (ip, port, chunks)
+            break
+    else:
+        seeders.append((ip, port, chunks))
+
+def record_seeder(filename, ip, port, chunks):
+    # Apply an announce and append it to the journal so it survives a restart
+    seen_at = max(time.time(), last_seen.get((filename, ip, port), 0))
+    upsert_seeder(filename, ip, port, chunks, seen_at)
+    if journal is None:
+        return
+    entry = {"file": filename, "ip": ip, "port": port, "chunks": chunks, "seen_at": seen_at}
+    try:
+        journal.write(json.dumps(entry) + "\n")
+        journal.flush()
+    except (OSError, ValueError) as e:
+        # Keep answering leechers from memory, the next snapshot still captures this announce
+        print(f"[WARNING] Could not journal announce for {filename}: {e}")
+
+def expire_seeders(now):
+    # Drop seeders that have not announced within SEEDER_TTL, called with registry_lock held
+    for filename in list(active_seeders):
+        seeders = [s for s in active_seeders[filename] if now - last_seen.get((filename, s[0], s[1]), 0) <= SEEDER_TTL]
+        for s in active_seeders[filename]:
+            if s not in seeders:
+                last_seen.pop((filename, s[0], s[1]), None)
+                print(f"Expired seeder {(s[0], s[1])} with file {filename}")
+        if seeders:
+            active_seeders[filename] = seeders
+        else:
+            del active_seeders[filename]
+
+def write_snapshot():
+    global journal, journal_index
+    with registry_lock:
+        expire_seeders(time.time())
+        snapshot = {filename: [[ip, port, chunks, last_seen[(filename, ip, port)]] for ip, port, chunks in seeders]
+                    for filename, seeders in active_seeders.items()}
+
+        # Start appending to the other journal, the current one is covered by this snapshot
+        previous_index = journal_index
+        try:
+            next_journal = open(JOURNAL_FILES[1 - journal_index], "a")
+        except OSError as e:
+            print(f"[WARNING] Could not open journal: {e}")
+            previous_index = None
+        else:
+            if journal is not None:
+                try:
+                    journal.close()
+                except OSError as e:
+                    print(f"[WARNING] Could not close journal: {e}")
+            journal = next_journal
+            journal_index = 1 - journal_index
+
+    # Write to a temporary file and swap it in so a crash never leaves a partial snapshot
+    tmp_file = SNAPSHOT_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, SNAPSHOT_FILE)
+
+    # Only now that the snapshot is on disk can the previous journal be emptied
+    if previous_index is not None:
+        open(JOURNAL_FILES[previous_index], "w").close()
+
+def load_state():
+    global journal
+    if os.path.exists(SNAPSHOT_FILE):
+        try:
+            with open(SNAPSHOT_FILE) as f:
+                snapshot = json.load(f)
+            for filename, seeders in snapshot.items():
+                for ip, port, chunks, seen_at in seeders:
+                    upsert_seeder(filename, ip, port, chunks, seen_at)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[WARNING] Could not load snapshot {SNAPSHOT_FILE}: {e}")
+
+    replayed = 0
+    for journal_file in JOURNAL_FILES:
+        if not os.path.exists(journal_file):
+            continue
+        try:
+            with open(journal_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        upsert_seeder(entry["file"], entry["ip"], entry["port"], entry["chunks"], entry["seen_at"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Torn write from a crash or a malformed entry
+                    replayed += 1
+        except OSError as e:
+            print(f"[WARNING] Could not replay journal {journal_file}: {e}")
+
+    expire_seeders(time.time())
+    try:
+        journal = open(JOURNAL_FILES[journal_index], "a")
+    except OSError as e:
+        print(f"[WARNING] Could not open journal, announces will not be journaled: {e}")
+    count = sum(len(seeders) for seeders in active_seeders.values())
+    print(f"[RESTORED] {count} seeders from snapshot and {replayed} journal entries")
 
 def handle_client():
     while True:
@@ -24,41 +148,36 @@ def handle_client():
         if message[0] == "REGISTER_SEEDER":
             filename = message[1]
             seeder_addr = (addr[0], int(message[2]))
-            
-            # Initialize with 0 chunks, will be updated when CHUNK_COUNT message is received
-            seeder_info = (seeder_addr[0], seeder_addr[1], 0)
-            
-            # Add or update seeder info
-            if filename in active_seeders:
-                # Check if this seeder already exists
-                existing_seeders = [s for s in active_seeders[filename] if (s[0], s[1]) == seeder_addr]
-                if existing_seeders:
-                    # Update existing entry (preserving chunk count)
-                    pass
-                else:
-                    # Add new seeder
-                    active_seeders[filename].append(seeder_info)
-            else:
-                active_seeders[filename] = [seeder_info]
-                
+
+            with registry_lock:
+                # Initialize with 0 chunks, will be updated when CHUNK_COUNT message is received
+                chunks = 0
+                for seeder in active_seeders.get(filename, []):
+                    if (seeder[0], seeder[1]) == seeder_addr:
+                        # Re-announce of an existing seeder (preserving chunk count)
+                        chunks = seeder[2]
+                record_seeder(filename, seeder_addr[0], seeder_addr[1], chunks)
+
             print(f"Registered seeder {seeder_addr} with file {filename}")
 
         elif message[0] == "CHUNK_COUNT":
             # Update the chunk count for the most recently registered seeder
             total_chunks = int(message[1])
-            
+
             # Find the seeder that sent this message
-            for filename, seeders in active_seeders.items():
-                for i, seeder in enumerate(seeders):
-                    if (seeder[0], seeder[1]) == (addr[0], SEEDER_PORT):
-                        # Update the chunk count
-                        active_seeders[filename][i] = (seeder[0], seeder[1], total_chunks)
-                        print(f"Updated seeder {(seeder[0], seeder[1])} WITH FILE {filename} has: {total_chunks} chunks")
-                        break
+            with registry_lock:
+                for filename, seeders in list(active_seeders.items()):
+                    for seeder in seeders:
+                        if (seeder[0], seeder[1]) == (addr[0], SEEDER_PORT):
+                            # Update the chunk count
+                            record_seeder(filename, seeder[0], seeder[1], total_chunks)
+                            print(f"Updated seeder {(seeder[0], seeder[1])} WITH FILE {filename} has: {total_chunks} chunks")
+                            break
 
         elif message[0] == "REQUEST_SEEDERS":
             filename = message[1]
-            seeders = active_seeders.get(filename, [])
+            with registry_lock:
+                seeders = list(active_seeders.get(filename, []))
             
             # Include chunk count in response
             response = "SEEDERS " + " ".join([f"{ip}:{port}:{chunks}" for ip, port, chunks in seeders]) if seeders else "NO_SEEDERS"
@@ -71,12 +190,17 @@ def handle_client():
 
 def start():
     print(f"[STARTING] Tracker is starting at {SERVER}:{PORT}")
+    load_state()
     threading.Thread(target=handle_client, daemon=True).start()
     print(f"[LISTENING] Tracker is listening on {SERVER}:{PORT}")
 
-    # The server runs indefinitely, handling client messages
+    # The server runs indefinitely, handling client messages while this thread snapshots the registry
     while True:
-        pass
+        time.sleep(SNAPSHOT_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError as e:
+            print(f"[WARNING] Could not write snapshot: {e}")
 
 # Global variable for the seeder port (needed for CHUNK_COUNT message handling)
 SEEDER_PORT = 7000